@@ -5,58 +5,68 @@ Test script to verify PDF processor configuration and dependencies.
 
 import os
 import sys
-from dotenv import load_dotenv
+import importlib.util
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_SAMPLE_ABS = r"C:\Users\kodag\Downloads\GITHUB\GasOps-DI-JSON\Sample json\sample.json"
+_SAMPLE_REL = os.path.join(_HERE, "Sample json", "sample.json")
+
+def _first(env, keys):
+    """Return the first non-empty value among ``keys`` in ``env``."""
+    for key in keys:
+        value = env.get(key)
+        if value:
+            return value
+    return None
 
 def test_configuration():
     """Test if all required configurations are present."""
+    from dotenv import load_dotenv
     load_dotenv()
+    env = dict(os.environ)
     
-    print("Testing PDF Processor Configuration")
-    print("=" * 40)
+    lines = ["Testing PDF Processor Configuration", "=" * 40]
     
     # Test Azure Document Intelligence
-    print("\n1. Azure Document Intelligence:")
-    endpoint = os.getenv("AZURE_DI_ENDPOINT") or os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT")
-    api_key = os.getenv("AZURE_DI_KEY") or os.getenv("AZURE_FORM_RECOGNIZER_KEY")
+    lines.append("\n1. Azure Document Intelligence:")
+    endpoint = _first(env, ("AZURE_DI_ENDPOINT", "AZURE_FORM_RECOGNIZER_ENDPOINT"))
+    api_key = _first(env, ("AZURE_DI_KEY", "AZURE_FORM_RECOGNIZER_KEY"))
     
     if endpoint and api_key:
-        print(f"   ✓ Endpoint: {endpoint}")
-        print(f"   ✓ API Key: {'*' * (len(api_key) - 4) + api_key[-4:] if len(api_key) > 4 else 'Set'}")
+        lines.append(f"   ✓ Endpoint: {endpoint}")
+        lines.append(f"   ✓ API Key: {'*' * (len(api_key) - 4) + api_key[-4:] if len(api_key) > 4 else 'Set'}")
     else:
-        print("   ✗ Missing Azure Document Intelligence credentials")
-        print("   Configure AZURE_DI_ENDPOINT and AZURE_DI_KEY in .env file")
+        lines.append("   ✗ Missing Azure Document Intelligence credentials")
+        lines.append("   Configure AZURE_DI_ENDPOINT and AZURE_DI_KEY in .env file")
     
     # Test AI Configuration
-    print("\n2. AI Configuration:")
+    lines.append("\n2. AI Configuration:")
     
     # Check Azure OpenAI
-    azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-    azure_key = os.getenv("AZURE_OPENAI_KEY") or os.getenv("AZURE_OPENAI_API_KEY")
-    azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+    azure_endpoint = env.get("AZURE_OPENAI_ENDPOINT")
+    azure_key = _first(env, ("AZURE_OPENAI_KEY", "AZURE_OPENAI_API_KEY"))
+    azure_deployment = env.get("AZURE_OPENAI_DEPLOYMENT")
     
     if azure_endpoint and azure_key and azure_deployment:
-        print("   ✓ Azure OpenAI configured")
-        print(f"   ✓ Endpoint: {azure_endpoint}")
-        print(f"   ✓ Deployment: {azure_deployment}")
+        lines.append("   ✓ Azure OpenAI configured")
+        lines.append(f"   ✓ Endpoint: {azure_endpoint}")
+        lines.append(f"   ✓ Deployment: {azure_deployment}")
     else:
         # Check OpenAI
-        openai_key = os.getenv("OPENAI_API_KEY")
+        openai_key = env.get("OPENAI_API_KEY")
         if openai_key:
-            print("   ✓ OpenAI configured")
-            print(f"   ✓ API Key: {'*' * (len(openai_key) - 4) + openai_key[-4:] if len(openai_key) > 4 else 'Set'}")
+            lines.append("   ✓ OpenAI configured")
+            lines.append(f"   ✓ API Key: {'*' * (len(openai_key) - 4) + openai_key[-4:] if len(openai_key) > 4 else 'Set'}")
         else:
-            print("   ✗ No AI configuration found")
-            print("   Configure either Azure OpenAI or OpenAI credentials in .env file")
+            lines.append("   ✗ No AI configuration found")
+            lines.append("   Configure either Azure OpenAI or OpenAI credentials in .env file")
     
     # Test sample.json template
-    print("\n3. Sample JSON Template:")
+    lines.append("\n3. Sample JSON Template:")
     try:
         # Try absolute path first
-        absolute_path = r"C:\Users\kodag\Downloads\GITHUB\GasOps-DI-JSON\Sample json\sample.json"
-        relative_path = os.path.join(os.path.dirname(__file__), "Sample json", "sample.json")
-        
         sample_path = None
-        for path in [absolute_path, relative_path]:
+        for path in (_SAMPLE_ABS, _SAMPLE_REL):
             if os.path.exists(path):
                 sample_path = path
                 break
@@ -65,39 +75,41 @@ def test_configuration():
             import json
             with open(sample_path, 'r', encoding='utf-8') as f:
                 template = json.load(f)
-            print(f"   ✓ Template found with {len(template)} top-level fields")
-            print(f"   ✓ Path: {sample_path}")
+            lines.append(f"   ✓ Template found with {len(template)} top-level fields")
+            lines.append(f"   ✓ Path: {sample_path}")
         else:
-            print(f"   ✗ Template not found at expected locations")
+            lines.append(f"   ✗ Template not found at expected locations")
     except Exception as e:
-        print(f"   ✗ Error loading template: {e}")
+        lines.append(f"   ✗ Error loading template: {e}")
     
     # Test dependencies
-    print("\n4. Dependencies:")
+    lines.append("\n4. Dependencies:")
     dependencies = [("requests", "requests"), ("python-dotenv", "dotenv"), ("openai", "openai")]
     all_ok = True
     
     for dep_name, import_name in dependencies:
-        try:
-            __import__(import_name)
-            print(f"   ✓ {dep_name}")
-        except ImportError:
-            print(f"   ✗ {dep_name} not installed")
+        # find_spec only locates the package; it does not execute the module body
+        if importlib.util.find_spec(import_name) is not None:
+            lines.append(f"   ✓ {dep_name}")
+        else:
+            lines.append(f"   ✗ {dep_name} not installed")
             all_ok = False
     
     # Final status
-    print("\n" + "=" * 40)
-    if endpoint and api_key and (azure_endpoint or openai_key) and sample_path and all_ok:
-        print("✓ Configuration complete! Ready to process PDF files.")
-        print("\nTo start the interactive processor:")
-        print("python pdf_processor.py")
-        print("\nOr see the demo:")
-        print("python demo.py")
+    lines.append("\n" + "=" * 40)
+    ready = bool(endpoint and api_key and (azure_endpoint or openai_key) and sample_path and all_ok)
+    if ready:
+        lines.append("✓ Configuration complete! Ready to process PDF files.")
+        lines.append("\nTo start the interactive processor:")
+        lines.append("python pdf_processor.py")
+        lines.append("\nOr see the demo:")
+        lines.append("python demo.py")
     else:
-        print("✗ Configuration incomplete. Please fix the issues above.")
-        return False
+        lines.append("✗ Configuration incomplete. Please fix the issues above.")
     
-    return True
+    # Write the whole report with a single stdout call
+    sys.stdout.write("\n".join(lines) + "\n")
+    return ready
 
 if __name__ == "__main__":
     test_configuration()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script for the HTTP retry and AI response parsing helpers of both processor scripts.
+Runs offline: the shared session and sleeps are replaced with stubs.
+"""
+
+import io
+import os
+import sys
+import importlib.util
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SCRIPTS = ("pdf_processor_DBC.py", "pdf_processor_new prompt.py")
+
+def _load_script(filename):
+    """Import a processor script by file name (one of them contains a space)."""
+    spec = importlib.util.spec_from_file_location(filename.replace(" ", "_")[:-3],
+                                                  os.path.join(_ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _emit(lines):
+    """Write buffered report lines to stdout with a single call."""
+    sys.stdout.write("\n".join(lines) + "\n")
+
+class _Response:
+    """Minimal stand-in for requests.Response."""
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {"Retry-After": retry_after} if retry_after is not None else {}
+
+class _Session:
+    """Session stub that returns queued responses and records each request body."""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.bodies = []
+    
+    def post(self, url, **kwargs):
+        data = kwargs.get("data")
+        self.bodies.append(data.read() if hasattr(data, "read") else data)
+        return self.responses.pop(0)
+
+class _Clock:
+    """Replacement for the time module that records sleeps instead of waiting."""
+    def __init__(self):
+        self.waits = []
+    
+    def sleep(self, seconds):
+        self.waits.append(seconds)
+
+def _post(module, responses, **kwargs):
+    """Run _post_with_retries against stubbed responses; return (response, session, clock)."""
+    session, clock = _Session(responses), _Clock()
+    saved = module.SESSION, module.time
+    module.SESSION, module.time = session, clock
+    try:
+        resp = module._post_with_retries("https://example.test", "Test", **kwargs)
+    finally:
+        module.SESSION, module.time = saved
+    return resp, session, clock
+
+def test_post_with_retries():
+    """Check retry count, waits and body rewinding of _post_with_retries."""
+    lines = ["Testing _post_with_retries", "=" * 40]
+    
+    for filename in _SCRIPTS:
+        module = _load_script(filename)
+        lines.append(f"\n{filename}:")
+        
+        resp, session, clock = _post(module, [_Response(200)], data=b"{}")
+        assert resp.status_code == 200 and len(session.bodies) == 1 and clock.waits == []
+        lines.append("   ✓ Success is returned without retrying")
+        
+        resp, session, clock = _post(module, [_Response(400), _Response(200)], data=b"{}")
+        assert resp.status_code == 400 and len(session.bodies) == 1
+        lines.append("   ✓ Non-transient errors are returned to the caller")
+        
+        resp, session, clock = _post(module, [_Response(503)] * 3, data=b"{}")
+        assert resp.status_code == 503 and len(session.bodies) == 3 and clock.waits == [1.0, 2.0]
+        lines.append("   ✓ 5xx is retried with 1 s, 2 s backoff and the last response returned")
+        
+        resp, session, clock = _post(module, [_Response(429, "7"), _Response(429, "120"), _Response(200)],
+                                     data=b"{}", max_wait=60.0)
+        assert resp.status_code == 200 and clock.waits == [7.0, 60.0]
+        lines.append("   ✓ Retry-After is honored and capped at max_wait")
+        
+        body = io.BytesIO(b"%PDF-1.7 test")
+        resp, session, clock = _post(module, [_Response(502), _Response(200)], data=body)
+        assert session.bodies == [b"%PDF-1.7 test", b"%PDF-1.7 test"]
+        lines.append("   ✓ File object bodies are rewound before a retry")
+    
+    _emit(lines)
+
+def test_extract_json_from_response():
+    """Check the reply shapes _extract_json_from_response accepts and rejects."""
+    lines = ["\nTesting _extract_json_from_response", "=" * 40]
+    cases = [
+        ("bare JSON-mode object", '{"HeatNumber": "A1"}', {"HeatNumber": "A1"}),
+        ("markdown fence with language tag", 'Here:\n```json\n{"HeatNumber": "A1"}\n```', {"HeatNumber": "A1"}),
+        ("object after prose", 'Result: {"HeatNumber": "A1"} done', {"HeatNumber": "A1"}),
+        ("braces inside strings", 'x {"Note": "a } b {"} y', {"Note": "a } b {"}),
+        ("skips an invalid candidate", '{bad} then {"HeatNumber": "A1"}', {"HeatNumber": "A1"}),
+        ("large integer kept exact", '{"CompanyMTRFileID": 123456789012345678901234567890}',
+         {"CompanyMTRFileID": 123456789012345678901234567890}),
+        ("truncated reply", '{"HeatNumber": "A1", "HNPipeDetails": [', None),
+        ("no JSON at all", "I could not read the document.", None),
+    ]
+    
+    for filename in _SCRIPTS:
+        module = _load_script(filename)
+        # The parser needs no credentials, so skip __init__'s configuration checks
+        processor = module.AITemplateProcessor.__new__(module.AITemplateProcessor)
+        lines.append(f"\n{filename}:")
+        for name, reply, expected in cases:
+            assert processor._extract_json_from_response(reply) == expected, name
+            lines.append(f"   ✓ {name}")
+    
+    _emit(lines)
+
+if __name__ == "__main__":
+    test_post_with_retries()
+    test_extract_json_from_response()
@@ -7,196 +7,282 @@ Tests if sample.json file is being read correctly by the main scripts.
 import os
 import sys
 import json
+import functools
 from pathlib import Path
 
-def test_sample_json_loading():
-    """Test loading sample.json template from various locations."""
-    print("Testing Sample JSON Template Loading")
-    print("=" * 50)
+try:
+    import orjson
+except ImportError:  # optional speedup; fall back to the stdlib parser
+    orjson = None
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_SAMPLE_ABS = r"C:\Users\kodag\Downloads\GITHUB\GasOps-DI-JSON\Sample json\sample.json"
+_SAMPLE_REL = os.path.join(_HERE, "Sample json", "sample.json")
+
+# Locations where sample.json might be located. Several spellings resolve to
+# the same file, so duplicates are dropped after normalization.
+_CANDIDATES = tuple(dict.fromkeys(map(os.path.normpath, [
+    # Absolute path (hardcoded in original script)
+    _SAMPLE_ABS,
     
-    # Test locations where sample.json might be located
-    test_locations = [
-        # Absolute path (hardcoded in original script)
-        r"C:\Users\kodag\Downloads\GITHUB\GasOps-DI-JSON\Sample json\sample.json",
-        
-        # Relative path from current script location
-        os.path.join(os.path.dirname(__file__), "Sample json", "sample.json"),
-        
-        # Alternative relative paths
-        os.path.join("Sample json", "sample.json"),
-        "./Sample json/sample.json",
-        "Sample json/sample.json",
-        
-        # In case it's in the current directory
-        "sample.json",
-        
-        # Using pathlib for cross-platform compatibility
-        str(Path(__file__).parent / "Sample json" / "sample.json"),
-    ]
+    # Relative path from current script location
+    _SAMPLE_REL,
     
-    print("Checking template locations:")
-    print("-" * 30)
+    # Alternative relative paths
+    os.path.join("Sample json", "sample.json"),
+    "./Sample json/sample.json",
+    "Sample json/sample.json",
     
+    # In case it's in the current directory
+    "sample.json",
+    
+    # Using pathlib for cross-platform compatibility
+    str(Path(_HERE) / "Sample json" / "sample.json"),
+])))
+
+# Replacement values for template leaves, keyed by exact type. Strings become
+# "", while numbers, booleans (checked by exact type, not as ints) and None
+# become None. Unknown leaf types also map to None.
+_LEAF_REPLACEMENT = {str: "", int: None, float: None, bool: None, type(None): None}
+
+@functools.lru_cache(maxsize=8)
+def _load_template(path):
+    """Load and parse a template file, caching the result per resolved path."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+    # keep catching the stdlib exception either way.
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode('utf-8'))
+
+def _emit(lines):
+    """Write buffered report lines to stdout with a single call."""
+    sys.stdout.write("\n".join(lines) + "\n")
+
+def _existing_paths(paths):
+    """Return the subset of ``paths`` that exist as directory entries.
+    
+    Candidates are grouped by parent directory so each directory is listed
+    once with ``os.scandir`` instead of stat-ing every path separately.
+    """
+    by_parent = {}
+    for path in paths:
+        parent, name = os.path.split(os.path.abspath(path))
+        by_parent.setdefault(parent, []).append((os.path.normcase(name), path))
+    
+    existing = set()
+    for parent, entries in by_parent.items():
+        try:
+            with os.scandir(parent) as it:
+                names = {os.path.normcase(entry.name) for entry in it}
+        except OSError:
+            continue
+        existing.update(path for name, path in entries if name in names)
+    return existing
+
+def _find_template_path(paths):
+    """Return the first candidate path that exists and loads as JSON, or None."""
+    existing = _existing_paths(paths)
+    for path in paths:
+        if path in existing:
+            try:
+                _load_template(os.path.abspath(path))
+            except Exception:
+                continue  # unreadable or invalid; try the next candidate
+            return path
+    return None
+
+def _probe_all_paths(paths):
+    """Check, load and describe every candidate path (diagnostic mode)."""
     found_templates = []
+    existing = _existing_paths(paths)
     
-    for i, path in enumerate(test_locations, 1):
-        print(f"{i}. Testing: {path}")
+    for i, path in enumerate(paths, 1):
+        # Buffer each path's report and write it with a single stdout call
+        lines = [f"{i}. Testing: {path}"]
         
         try:
-            if os.path.exists(path):
-                print(f"   ✓ File exists!")
+            if path in existing:
+                lines.append(f"   ✓ File exists!")
                 
                 # Try to load and parse the JSON
-                with open(path, 'r', encoding='utf-8') as f:
-                    template_data = json.load(f)
+                template_data = _load_template(os.path.abspath(path))
                 
-                print(f"   ✓ Successfully loaded JSON with {len(template_data)} top-level fields")
+                lines.append(f"   ✓ Successfully loaded JSON with {len(template_data)} top-level fields")
                 
                 # Show some key information about the template
                 if "CompanyMTRFileID" in template_data:
-                    print(f"   ✓ Contains CompanyMTRFileID: {template_data['CompanyMTRFileID']}")
+                    lines.append(f"   ✓ Contains CompanyMTRFileID: {template_data['CompanyMTRFileID']}")
                 
                 if "HNPipeDetails" in template_data:
                     pipe_details = template_data["HNPipeDetails"]
                     if isinstance(pipe_details, list) and len(pipe_details) > 0:
-                        print(f"   ✓ Contains HNPipeDetails array with {len(pipe_details)} item(s)")
+                        lines.append(f"   ✓ Contains HNPipeDetails array with {len(pipe_details)} item(s)")
                         
                         # Check for chemical results
                         first_pipe = pipe_details[0]
                         if "HNPipeHeatChemicalResults" in first_pipe:
                             chem_keys = list(first_pipe["HNPipeHeatChemicalResults"].keys())
-                            print(f"   ✓ HNPipeHeatChemicalResults has {len(chem_keys)} fields")
+                            lines.append(f"   ✓ HNPipeHeatChemicalResults has {len(chem_keys)} fields")
                 
                 found_templates.append({
                     "path": path,
                     "data": template_data,
-                    "size": len(json.dumps(template_data))
+                    "size": os.path.getsize(path)
                 })
                 
             else:
-                print(f"   ✗ File not found")
+                lines.append(f"   ✗ File not found")
                 
         except json.JSONDecodeError as e:
-            print(f"   ✗ JSON parsing error: {e}")
+            lines.append(f"   ✗ JSON parsing error: {e}")
         except Exception as e:
-            print(f"   ✗ Error: {e}")
+            lines.append(f"   ✗ Error: {e}")
         
-        print()
+        lines.append("")
+        _emit(lines)
+    
+    return found_templates
+
+def test_sample_json_loading(verbose=False):
+    """Test loading sample.json template from various locations.
+    
+    By default only the first location that loads is reported; pass
+    ``verbose=True`` to probe and report on every candidate path.
+    """
+    lines = ["Testing Sample JSON Template Loading"]
+    lines.append("=" * 50)
+    
+    lines.append("Checking template locations:")
+    lines.append("-" * 30)
+    _emit(lines)
+    
+    if verbose:
+        found_templates = _probe_all_paths(_CANDIDATES)
+    else:
+        first_path = _find_template_path(_CANDIDATES)
+        found_templates = _probe_all_paths([first_path]) if first_path else []
     
     # Summary
-    print("=" * 50)
-    print(f"SUMMARY: Found {len(found_templates)} valid template(s)")
+    lines = ["=" * 50]
+    lines.append(f"SUMMARY: Found {len(found_templates)} valid template(s)")
     
     if found_templates:
-        print("\nValid templates found:")
+        lines.append("\nValid templates found:")
         for i, template in enumerate(found_templates, 1):
-            print(f"{i}. {template['path']}")
-            print(f"   Size: {template['size']} characters")
-            print(f"   Top-level fields: {list(template['data'].keys())}")
+            lines.append(f"{i}. {template['path']}")
+            lines.append(f"   Size: {template['size']} bytes")
+            lines.append(f"   Top-level fields: {list(template['data'].keys())}")
         
         # Return the first found template for further testing
+        _emit(lines)
         return found_templates[0]
     else:
-        print("\n❌ No valid sample.json templates found!")
-        print("\nPlease ensure sample.json exists in one of these locations:")
-        for path in test_locations[:3]:  # Show main expected locations
-            print(f"  - {path}")
+        lines.append("\n❌ No valid sample.json templates found!")
+        lines.append("\nPlease ensure sample.json exists in one of these locations:")
+        for path in _CANDIDATES[:3]:  # Show main expected locations
+            lines.append(f"  - {path}")
+        _emit(lines)
         return None
 
-def test_template_cleaning():
-    """Test the template cleaning function from the main scripts."""
-    print("\n" + "=" * 50)
-    print("Testing Template Cleaning Function")
-    print("=" * 50)
+def test_template_cleaning(template_info=None):
+    """Test the template cleaning function from the main scripts.
+    
+    ``template_info`` is the result of ``test_sample_json_loading``; it is
+    only loaded here when the caller has not already done so.
+    """
+    _emit(["\n" + "=" * 50, "Testing Template Cleaning Function", "=" * 50])
     
     # Load a template first
-    template_info = test_sample_json_loading()
+    if template_info is None:
+        template_info = test_sample_json_loading()
     if not template_info:
-        print("Cannot test cleaning - no template found")
+        _emit(["Cannot test cleaning - no template found"])
         return
     
     original_template = template_info["data"]
     
-    print(f"Original template preview:")
-    print(f"CompanyMTRFileID: {original_template.get('CompanyMTRFileID')}")
-    print(f"HeatNumber: {original_template.get('HeatNumber')}")
+    lines = [f"Original template preview:"]
+    lines.append(f"CompanyMTRFileID: {original_template.get('CompanyMTRFileID')}")
+    lines.append(f"HeatNumber: {original_template.get('HeatNumber')}")
     
     # Test the cleaning function (mimicking the one from main scripts)
     def clean_template_values(obj):
-        """Clean template values for testing."""
-        if isinstance(obj, dict):
-            cleaned = {}
-            for key, value in obj.items():
-                if isinstance(value, (dict, list)):
-                    cleaned[key] = clean_template_values(value)
-                elif isinstance(value, str):
-                    cleaned[key] = ""
-                elif isinstance(value, (int, float)):
-                    cleaned[key] = None
-                elif isinstance(value, bool):
-                    cleaned[key] = None
-                else:
-                    cleaned[key] = None
-            return cleaned
-        elif isinstance(obj, list):
-            if len(obj) > 0:
-                return [clean_template_values(obj[0])]
-            else:
-                return []
-        else:
+        """Clean template values for testing (iterative walk, no recursion)."""
+        if type(obj) is not dict and type(obj) is not list:
             return obj
+        root = {} if type(obj) is dict else []
+        stack = [(obj, root)]
+        while stack:
+            source, target = stack.pop()
+            if type(source) is dict:
+                for key, value in source.items():
+                    kind = type(value)
+                    if kind is dict or kind is list:
+                        child = {} if kind is dict else []
+                        target[key] = child
+                        stack.append((value, child))
+                    else:
+                        target[key] = _LEAF_REPLACEMENT.get(kind)
+            elif source:
+                # Lists keep only their first element as the structural sample
+                first = source[0]
+                kind = type(first)
+                if kind is dict or kind is list:
+                    child = {} if kind is dict else []
+                    target.append(child)
+                    stack.append((first, child))
+                else:
+                    target.append(first)
+        return root
     
-    print("\nCleaning template...")
+    lines.append("\nCleaning template...")
     cleaned_template = clean_template_values(original_template)
     
-    print(f"Cleaned template preview:")
-    print(f"CompanyMTRFileID: {cleaned_template.get('CompanyMTRFileID')}")
-    print(f"HeatNumber: {cleaned_template.get('HeatNumber')}")
+    lines.append(f"Cleaned template preview:")
+    lines.append(f"CompanyMTRFileID: {cleaned_template.get('CompanyMTRFileID')}")
+    lines.append(f"HeatNumber: {cleaned_template.get('HeatNumber')}")
     
     # Show structure preservation
-    print(f"\nStructure preservation check:")
-    print(f"Original keys: {list(original_template.keys())}")
-    print(f"Cleaned keys: {list(cleaned_template.keys())}")
-    print(f"Keys match: {list(original_template.keys()) == list(cleaned_template.keys())}")
+    lines.append(f"\nStructure preservation check:")
+    lines.append(f"Original keys: {list(original_template.keys())}")
+    lines.append(f"Cleaned keys: {list(cleaned_template.keys())}")
+    lines.append(f"Keys match: {list(original_template.keys()) == list(cleaned_template.keys())}")
+    _emit(lines)
     
     return cleaned_template
 
 def test_main_script_integration():
     """Test how the main scripts would load the template."""
-    print("\n" + "=" * 50)
-    print("Testing Main Script Integration")
-    print("=" * 50)
+    lines = ["\n" + "=" * 50]
+    lines.append("Testing Main Script Integration")
+    lines.append("=" * 50)
     
     # Simulate the original script's load_sample_json_template function
     def load_sample_json_template_original():
         """Simulate the original function."""
-        # Try absolute path first
-        absolute_path = r"C:\Users\kodag\Downloads\GITHUB\GasOps-DI-JSON\Sample json\sample.json"
-        
-        # Try relative path as fallback
-        relative_path = os.path.join(os.path.dirname(__file__), "Sample json", "sample.json")
-        
-        for sample_path in [absolute_path, relative_path]:
+        # Try absolute path first, relative path as fallback
+        for sample_path in (_SAMPLE_ABS, _SAMPLE_REL):
             try:
                 if os.path.exists(sample_path):
-                    with open(sample_path, 'r', encoding='utf-8') as f:
-                        template = json.load(f)
-                    print(f"✓ Original method: Loaded from {sample_path}")
+                    template = _load_template(os.path.abspath(sample_path))
+                    lines.append(f"✓ Original method: Loaded from {sample_path}")
                     return template, sample_path
             except Exception as e:
-                print(f"✗ Original method failed for {sample_path}: {e}")
+                lines.append(f"✗ Original method failed for {sample_path}: {e}")
                 continue
         
-        print("✗ Original method: Could not load from any location")
+        lines.append("✗ Original method: Could not load from any location")
         return None, None
     
     # Test the original method
     template, path = load_sample_json_template_original()
     
     if template:
-        print(f"✓ Template successfully loaded")
-        print(f"✓ Path: {path}")
-        print(f"✓ Contains {len(template)} top-level fields")
+        lines.append(f"✓ Template successfully loaded")
+        lines.append(f"✓ Path: {path}")
+        lines.append(f"✓ Contains {len(template)} top-level fields")
         
         # Test specific fields that are important for materials testing
         important_fields = [
@@ -207,12 +293,12 @@ def test_main_script_integration():
             "HNPipeDetails"
         ]
         
-        print("\nChecking important fields:")
+        lines.append("\nChecking important fields:")
         for field in important_fields:
             if field in template:
-                print(f"✓ {field}: Present")
+                lines.append(f"✓ {field}: Present")
             else:
-                print(f"✗ {field}: Missing")
+                lines.append(f"✗ {field}: Missing")
         
         # Check nested structure
         if "HNPipeDetails" in template and isinstance(template["HNPipeDetails"], list):
@@ -224,45 +310,49 @@ def test_main_script_integration():
                     "HNPipeTensileTestResults"
                 ]
                 
-                print("\nChecking nested pipe detail fields:")
+                lines.append("\nChecking nested pipe detail fields:")
                 for field in nested_fields:
                     if field in pipe_detail:
                         if isinstance(pipe_detail[field], dict):
-                            print(f"✓ {field}: Present (dict with {len(pipe_detail[field])} fields)")
+                            lines.append(f"✓ {field}: Present (dict with {len(pipe_detail[field])} fields)")
                         else:
-                            print(f"✓ {field}: Present ({type(pipe_detail[field]).__name__})")
+                            lines.append(f"✓ {field}: Present ({type(pipe_detail[field]).__name__})")
                     else:
-                        print(f"✗ {field}: Missing")
+                        lines.append(f"✗ {field}: Missing")
         
+        _emit(lines)
         return True
     else:
-        print("❌ Template loading failed!")
+        lines.append("❌ Template loading failed!")
+        _emit(lines)
         return False
 
 def main():
     """Run all template loading tests."""
-    print("Sample JSON Template Loading Test Suite")
-    print("=" * 60)
-    print(f"Current working directory: {os.getcwd()}")
-    print(f"Script location: {os.path.dirname(__file__)}")
-    print()
+    lines = ["Sample JSON Template Loading Test Suite"]
+    lines.append("=" * 60)
+    lines.append(f"Current working directory: {os.getcwd()}")
+    lines.append(f"Script location: {_HERE}")
+    lines.append("")
+    _emit(lines)
     
     # Run tests
-    test_sample_json_loading()
-    test_template_cleaning()
+    template_info = test_sample_json_loading(verbose=True)
+    test_template_cleaning(template_info)
     success = test_main_script_integration()
     
-    print("\n" + "=" * 60)
+    lines = ["\n" + "=" * 60]
     if success:
-        print("✅ ALL TESTS PASSED - Template loading works correctly!")
+        lines.append("✅ ALL TESTS PASSED - Template loading works correctly!")
     else:
-        print("❌ TESTS FAILED - Template loading needs attention!")
+        lines.append("❌ TESTS FAILED - Template loading needs attention!")
     
-    print("\nTo fix template loading issues:")
-    print("1. Ensure sample.json exists in the 'Sample json' folder")
-    print("2. Check file permissions and encoding (should be UTF-8)")
-    print("3. Validate JSON syntax using an online JSON validator")
-    print("4. Update absolute paths in scripts if necessary")
+    lines.append("\nTo fix template loading issues:")
+    lines.append("1. Ensure sample.json exists in the 'Sample json' folder")
+    lines.append("2. Check file permissions and encoding (should be UTF-8)")
+    lines.append("3. Validate JSON syntax using an online JSON validator")
+    lines.append("4. Update absolute paths in scripts if necessary")
+    _emit(lines)
 
 if __name__ == "__main__":
     main()
@@ -11,37 +11,224 @@ Architecture:
 """
 
 import os
+import re
 import sys
 import json
-import re
 import time
+import hashlib
+import threading
 import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, BinaryIO, List, Union
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # optional speedup; fall back to the stdlib json module
+    orjson = None
+
+try:
+    import tiktoken
+except ImportError:  # optional; OCR text is then truncated by characters
+    tiktoken = None
+
 load_dotenv()
 
+# Fields of the Document Intelligence result that carry recognized text
+_OCR_TEXT_KEYS = frozenset(("content", "text", "value"))
+
+# HTTP statuses worth retrying: throttling and transient server/gateway errors
+_TRANSIENT_STATUS = frozenset((429, 500, 502, 503, 504))
+
+# Decoder used to pull a JSON value out of surrounding text in AI responses
+_JSON_DECODER = json.JSONDecoder()
+
+# A run of 20+ digits may be an integer beyond 64 bits, which orjson would
+# read as a float; such input is parsed with the stdlib instead
+_LONG_DIGITS = re.compile("[0-9]{20}")
+_LONG_DIGITS_BYTES = re.compile(b"[0-9]{20}")
+
+
+class _CappedRetry(Retry):
+    """urllib3 retry policy that never sleeps longer than RETRY_AFTER_MAX on Retry-After."""
+    
+    RETRY_AFTER_MAX = 10.0
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.RETRY_AFTER_MAX)
+
+
+def _build_session() -> requests.Session:
+    """Create the pooled, retrying HTTP session shared by all Azure/OpenAI calls."""
+    # Idempotent requests (the polls) are retried on throttling/gateway errors
+    session = requests.Session()
+    retries = _CappedRetry(total=3, backoff_factor=0.2, status_forcelist=_TRANSIENT_STATUS,
+                    raise_on_status=False)
+    session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=16, max_retries=retries))
+    return session
+
+
+SESSION = _build_session()
+
+# Default template locations, tried in order when no template path is given
+DEFAULT_TEMPLATE_PATHS = (
+    r"C:\Users\kodag\Downloads\GITHUB\GasOps-DI-JSON\Sample json\sample.json",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "Sample json", "sample.json"),
+)
+
+
+def _json_dumps(obj: Any, pretty: bool = False) -> str:
+    """Serialize to a JSON string, using orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0).decode("utf-8")
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits, which the stdlib handles
+    return json.dumps(obj, indent=2 if pretty else None, ensure_ascii=False)
+
+
+def _json_body(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes for a request body."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits, which the stdlib handles
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(data: Any) -> Any:
+    """Parse JSON text or bytes, using orjson when it is installed."""
+    if orjson is not None:
+        long_digits = _LONG_DIGITS if isinstance(data, str) else _LONG_DIGITS_BYTES
+        if not long_digits.search(data):
+            return orjson.loads(data)
+    return json.loads(data)
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Return the Retry-After header in seconds, or None if absent or not numeric."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
+
+
+def _positive_env(name: str, default: Union[int, float], cast=float) -> Union[int, float]:
+    """Read a positive number from the environment, warning and using default if it is invalid."""
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        value = cast(raw)
+    except ValueError:
+        value = None
+    # The comparison also rejects NaN and infinity
+    if value is None or not 0 < value < float("inf"):
+        print(f"Warning: Ignoring invalid {name}={raw!r}; using {default}")
+        return default
+    return value
+
+
+def _read_cache_file(cache_file: str) -> Optional[Dict[str, Any]]:
+    """Load a stored cache entry, or return None if it is missing or unreadable."""
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'rb') as f:
+            return _json_loads(f.read())
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable cache file {cache_file}: {e}")
+        return None
+
+
+def _write_text_atomic(path: str, text: str):
+    """Write a text file via a temporary sibling so readers never see a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_cache_file(cache_file: str, data: Dict[str, Any]):
+    """Store a cache entry; failures only cost a future cache miss."""
+    try:
+        os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+        _write_text_atomic(cache_file, _json_dumps(data))
+    except Exception as e:
+        print(f"Warning: Could not write cache file {cache_file}: {e}")
+
+
+def _post_with_retries(url: str, label: str, attempts: int = 3, max_wait: float = 60.0,
+                       **kwargs) -> requests.Response:
+    """POST through the shared session, retrying 429/5xx responses and returning the last one."""
+    # Waits as long as Retry-After asks, else 1 s, 2 s, 4 s, ... capped at max_wait;
+    # a file object body is rewound to its start before each retry
+    data = kwargs.get("data")
+    start = data.tell() if hasattr(data, "seek") else None
+    for attempt in range(attempts):
+        if attempt and start is not None:
+            data.seek(start)
+        resp = SESSION.post(url, **kwargs)
+        if resp.status_code not in _TRANSIENT_STATUS or attempt == attempts - 1:
+            return resp
+        
+        wait = _retry_after_seconds(resp)
+        wait = min(wait if wait is not None else 2.0 ** attempt, max_wait)
+        print(f"{label} returned {resp.status_code}; retrying in {wait:.1f}s...")
+        time.sleep(wait)
+
 
 class DocumentIntelligenceOCR:
     """Handles OCR text extraction using Azure Document Intelligence."""
     
-    def __init__(self, endpoint: str, api_key: str, model_id: str = "prebuilt-document", api_version: str = "2023-07-31"):
+    # Number of analysis results kept in memory for repeat documents
+    RESULT_CACHE_SIZE = 16
+    # Growth factor applied to the poll wait when the service sends no Retry-After
+    POLL_BACKOFF_FACTOR = 1.7
+    # Characters of text collected by the fallback result walker before it stops
+    TEXT_BUDGET_CHARS = 200_000
+    
+    def __init__(self, endpoint: str, api_key: str, model_id: str = "prebuilt-document", api_version: str = "2023-07-31",
+                 cache_dir: Optional[str] = None, poll_timeout: float = 300.0):
         """Initialize OCR processor with Azure credentials."""
         self.endpoint = endpoint.rstrip('/')
         self.api_key = api_key
         self.model_id = model_id
         self.api_version = api_version
+        self.cache_dir = cache_dir
+        self.poll_timeout = poll_timeout
+        # Request URL and auth header are fixed per processor, so build them once
+        self._analyze_url = (f"{self.endpoint}/formrecognizer/documentModels/{self.model_id}:analyze"
+                             f"?api-version={self.api_version}")
+        self._auth_headers = {"Ocp-Apim-Subscription-Key": self.api_key}
+        self._result_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
         
         if not self.endpoint or not self.api_key:
             raise ValueError("Missing Azure Document Intelligence credentials")
     
-    def extract_text_from_pdf(self, file_bytes: bytes, content_type: str = "application/pdf") -> str:
-        """Extract text from PDF using Document Intelligence OCR."""
+    def extract_text_from_pdf(self, file_data: Union[bytes, BinaryIO], content_type: str = "application/pdf") -> str:
+        """Extract text from PDF bytes or a binary file object using Document Intelligence OCR."""
         print(f"Starting OCR extraction with model: {self.model_id}")
         
-        # Call Document Intelligence API
-        ocr_result = self._call_document_intelligence_api(file_bytes, content_type)
+        # Call Document Intelligence API (reusing the result for identical input)
+        ocr_result = self._analyze_cached(file_data, content_type)
         
         # Extract text from result
         extracted_text = self._parse_ocr_result(ocr_result)
@@ -52,16 +239,55 @@ class DocumentIntelligenceOCR:
         print(f"Successfully extracted {len(extracted_text)} characters of text")
         return extracted_text
     
-    def _call_document_intelligence_api(self, file_bytes: bytes, content_type: str) -> Dict[str, Any]:
+    def _analyze_cached(self, file_data: Union[bytes, BinaryIO], content_type: str) -> Dict[str, Any]:
+        """Return the analysis result for the given document, calling the API only on a cache miss."""
+        digest = self._content_digest(file_data)
+        cache_key = (digest, content_type, self.model_id, self.api_version)
+        with self._cache_lock:
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                self._result_cache.move_to_end(cache_key)
+        if cached is not None:
+            print("Using cached OCR result for identical document")
+            return cached
+        
+        cache_file = None
+        if self.cache_dir:
+            cache_file = os.path.join(self.cache_dir, f"{digest}_{self.model_id}_{self.api_version}.json")
+        
+        result = _read_cache_file(cache_file) if cache_file else None
+        if result is not None:
+            print(f"Using cached OCR result from: {cache_file}")
+        else:
+            result = self._call_document_intelligence_api(file_data, content_type)
+            if cache_file:
+                _write_cache_file(cache_file, result)
+        
+        with self._cache_lock:
+            self._result_cache[cache_key] = result
+            if len(self._result_cache) > self.RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+        return result
+    
+    @staticmethod
+    def _content_digest(file_data: Union[bytes, BinaryIO]) -> str:
+        """Return a BLAKE2b hex digest of the document, rewinding file objects afterwards."""
+        if isinstance(file_data, (bytes, bytearray)):
+            return hashlib.blake2b(file_data, digest_size=16).hexdigest()
+        
+        digest = hashlib.blake2b(digest_size=16)
+        start = file_data.tell()
+        for chunk in iter(lambda: file_data.read(1 << 20), b""):
+            digest.update(chunk)
+        file_data.seek(start)
+        return digest.hexdigest()
+    
+    def _call_document_intelligence_api(self, file_data: Union[bytes, BinaryIO], content_type: str) -> Dict[str, Any]:
         """Make API call to Document Intelligence service."""
-        analyze_url = f"{self.endpoint}/formrecognizer/documentModels/{self.model_id}:analyze?api-version={self.api_version}"
-        headers = {
-            "Ocp-Apim-Subscription-Key": self.api_key,
-            "Content-Type": content_type
-        }
+        headers = {**self._auth_headers, "Content-Type": content_type}
         
         # Submit analysis request
-        resp = requests.post(analyze_url, headers=headers, data=file_bytes)
+        resp = _post_with_retries(self._analyze_url, "Document Intelligence", headers=headers, data=file_data)
         
         if resp.status_code not in (200, 202):
             self._handle_api_error(resp)
@@ -69,10 +295,13 @@ class DocumentIntelligenceOCR:
         # Check if we have operation location for polling
         op_location = resp.headers.get("operation-location") or resp.headers.get("Operation-Location")
         if not op_location:
-            return resp.json()
+            return _json_loads(resp.content)
         
-        # Poll for completion
-        return self._poll_for_completion(op_location)
+        # Poll for completion, starting with the wait the service asked for
+        first_delay = _retry_after_seconds(resp)
+        if first_delay is None:
+            return self._poll_for_completion(op_location, timeout=self.poll_timeout)
+        return self._poll_for_completion(op_location, timeout=self.poll_timeout, initial_delay=first_delay)
     
     def _handle_api_error(self, response: requests.Response):
         """Handle API error responses with helpful hints."""
@@ -94,22 +323,25 @@ class DocumentIntelligenceOCR:
         
         raise RuntimeError(f"OCR API call failed: {response.status_code} {response.text}")
     
-    def _poll_for_completion(self, operation_location: str, max_retries: int = 60) -> Dict[str, Any]:
-        """Poll the operation location until analysis is complete."""
+    def _poll_for_completion(self, operation_location: str, timeout: float = 300.0,
+                             initial_delay: float = 0.2, max_delay: float = 5.0) -> Dict[str, Any]:
+        """Poll the operation location until analysis is complete or timeout seconds pass."""
         print("Waiting for OCR analysis to complete...")
         
-        for attempt in range(max_retries):
-            time.sleep(1)
+        # Back off from initial_delay up to max_delay unless Retry-After says otherwise.
+        # Waits stop at the deadline and each poll request may only use the time left.
+        deadline = time.monotonic() + timeout
+        delay = initial_delay
+        while time.monotonic() < deadline:
+            time.sleep(max(min(delay, deadline - time.monotonic()), 0.0))
             
-            get_resp = requests.get(
-                operation_location, 
-                headers={"Ocp-Apim-Subscription-Key": self.api_key}
-            )
+            get_resp = SESSION.get(operation_location, headers=self._auth_headers,
+                                   timeout=max(deadline - time.monotonic(), 1.0))
             
             if get_resp.status_code not in (200, 201):
                 raise RuntimeError(f"Polling failed: {get_resp.status_code} {get_resp.text}")
             
-            result = get_resp.json()
+            result = _json_loads(get_resp.content)
             status = result.get("status", "").lower()
             
             if status == "succeeded":
@@ -117,53 +349,131 @@ class DocumentIntelligenceOCR:
                 return result
             elif status in ("failed", "cancelled"):
                 raise RuntimeError(f"OCR analysis {status}: {result}")
+            
+            retry_after = _retry_after_seconds(get_resp)
+            if retry_after is not None:
+                delay = retry_after
+            else:
+                delay = min(delay * self.POLL_BACKOFF_FACTOR, max_delay)
         
         raise RuntimeError("Timed out waiting for OCR analysis to complete")
     
     def _parse_ocr_result(self, result_json: Dict[str, Any]) -> str:
         """Extract plain text from Document Intelligence OCR result."""
+        # Accept the full operation response or a bare analyzeResult object
+        analyze_result = result_json.get("analyzeResult", result_json)
+        if isinstance(analyze_result, dict):
+            content = analyze_result.get("content")
+            if isinstance(content, str) and content:
+                return content
+            
+            lines = self._page_lines(analyze_result.get("pages"))
+            if lines:
+                return "\n".join(lines)
+        
         text_parts = []
+        remaining = self.TEXT_BUDGET_CHARS
         
-        def recurse_text(obj):
+        # Depth-first walk with an explicit stack; children are pushed in
+        # reverse so text is collected in document order. Each dict is scanned
+        # once, collecting text fields and queueing only nested containers.
+        stack = [result_json]
+        while stack and remaining > 0:
+            obj = stack.pop()
             if isinstance(obj, dict):
-                # Check for text content in various fields
-                for key in ("content", "text", "value"):
-                    if key in obj and isinstance(obj[key], str):
-                        text_parts.append(obj[key])
-                # Recurse through other keys
-                for v in obj.values():
-                    recurse_text(v)
+                children = []
+                for key, value in obj.items():
+                    if isinstance(value, str):
+                        # Check for text content in various fields
+                        if key in _OCR_TEXT_KEYS:
+                            text_parts.append(value)
+                            remaining -= len(value)
+                    elif isinstance(value, (dict, list)):
+                        children.append(value)
+                stack.extend(reversed(children))
             elif isinstance(obj, list):
-                for item in obj:
-                    recurse_text(item)
+                stack.extend(item for item in reversed(obj) if isinstance(item, (dict, list)))
         
-        recurse_text(result_json)
         return "\n".join(text_parts)
+    
+    @staticmethod
+    def _page_lines(pages: Any) -> List[str]:
+        """Return the text of every line on every page, or [] if the layout is not as documented."""
+        if not isinstance(pages, list):
+            return []
+        lines = []
+        for page in pages:
+            if not isinstance(page, dict):
+                return []
+            for line in page.get("lines") or ():
+                content = line.get("content") if isinstance(line, dict) else None
+                if isinstance(content, str):
+                    lines.append(content)
+        return lines
 
 
 class AITemplateProcessor:
     """Handles AI processing to convert OCR text into structured JSON."""
     
+    # Number of raw AI responses kept in memory for repeat prompts
+    RESPONSE_CACHE_SIZE = 128
+    # Attempts per AI request on throttling or transient errors (429/5xx), and
+    # the longest single wait between attempts in seconds
+    RETRY_ATTEMPTS = 3
+    RETRY_MAX_WAIT = 60.0
+    # OCR text budget per prompt: in tokens when tiktoken is installed, otherwise
+    # in characters (about four characters per token for OCR text)
+    OCR_TEXT_MAX_TOKENS = 12500
+    OCR_TEXT_MAX_CHARS = 50000
+    
     def __init__(self):
         """Initialize AI processor with available credentials."""
+        # Cleaned templates per requested path, and the prompt text of the last
+        # template used. Templates are treated as read-only once loaded.
+        self._template_cache: Dict[Optional[str], Dict[str, Any]] = {}
+        self._template_text: Optional[tuple] = None
+        self._template_lock = threading.Lock()
+        self._response_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._encoding = None  # tiktoken encoding (False if unavailable), loaded on first long text
+        self._cache_lock = threading.Lock()
+        
+        # Optional directory where responses persist across runs
+        self.cache_dir = os.getenv("AI_CACHE_DIR") or None
+        
         self.ai_config = self._detect_ai_configuration()
         if not self.ai_config:
             raise ValueError("No AI configuration found. Please configure Azure OpenAI or OpenAI credentials.")
+        
+        # JSON mode makes the service return a bare JSON object. Azure OpenAI only
+        # accepts response_format from API version 2023-12-01-preview, so it is on
+        # by default for OpenAI and newer Azure versions; AI_JSON_MODE overrides.
+        json_mode = os.getenv("AI_JSON_MODE", "").strip().lower()
+        if json_mode:
+            self.json_mode = json_mode not in ("0", "false", "no")
+        else:
+            self.json_mode = (self.ai_config["type"] != "azure_openai"
+                              or self.ai_config["api_version"] >= "2023-12-01")
     
-    def _detect_ai_configuration(self) -> Optional[Dict[str, str]]:
-        """Detect and validate available AI configuration."""
+    def _detect_ai_configuration(self) -> Optional[Dict[str, Any]]:
+        """Detect and validate available AI configuration, resolving the request URL and headers once."""
         # Check Azure OpenAI first
         azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
         azure_key = os.getenv("AZURE_OPENAI_KEY") or os.getenv("AZURE_OPENAI_API_KEY")
         azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT")
         
         if azure_endpoint and azure_key and azure_deployment:
+            endpoint = azure_endpoint.rstrip('/')
+            api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2023-10-01")
             return {
                 "type": "azure_openai",
-                "endpoint": azure_endpoint.rstrip('/'),
+                "label": "Azure OpenAI",
+                "endpoint": endpoint,
                 "key": azure_key,
                 "deployment": azure_deployment,
-                "api_version": os.getenv("AZURE_OPENAI_API_VERSION", "2023-10-01")
+                "api_version": api_version,
+                "url": (f"{endpoint}/openai/deployments/{azure_deployment}/"
+                        f"chat/completions?api-version={api_version}"),
+                "headers": {"api-key": azure_key, "Content-Type": "application/json"},
             }
         
         # Check OpenAI
@@ -171,28 +481,37 @@ class AITemplateProcessor:
         if openai_key:
             return {
                 "type": "openai",
+                "label": "OpenAI",
                 "key": openai_key,
-                "model": "gpt-3.5-turbo"
+                "model": "gpt-3.5-turbo",
+                "url": "https://api.openai.com/v1/chat/completions",
+                "headers": {"Authorization": f"Bearer {openai_key}", "Content-Type": "application/json"},
             }
         
         return None
     
     def load_template(self, template_path: Optional[str] = None) -> Dict[str, Any]:
-        """Load and clean the JSON template."""
-        if not template_path:
-            # Try default locations
-            template_paths = [
-                r"C:\Users\kodag\Downloads\GITHUB\GasOps-DI-JSON\Sample json\sample.json",
-                os.path.join(os.path.dirname(__file__), "Sample json", "sample.json")
-            ]
-        else:
-            template_paths = [template_path]
+        """Load and clean the JSON template, reusing it for repeat calls with the same path."""
+        template = self._template_cache.get(template_path)
+        if template is None:
+            # Concurrent batch workers wait for the first load instead of repeating it
+            with self._template_lock:
+                template = self._template_cache.get(template_path)
+                if template is None:
+                    template = self._read_template(template_path)
+                    self._template_cache[template_path] = template
+        return template
+    
+    def _read_template(self, template_path: Optional[str]) -> Dict[str, Any]:
+        """Read the JSON template from disk and clean its sample values."""
+        # Try default locations unless a path was given
+        template_paths = [template_path] if template_path else DEFAULT_TEMPLATE_PATHS
         
         for path in template_paths:
             try:
                 if os.path.exists(path):
-                    with open(path, 'r', encoding='utf-8') as f:
-                        template = json.load(f)
+                    with open(path, 'rb') as f:
+                        template = _json_loads(f.read())
                     print(f"Loaded template from: {path}")
                     return self._clean_template_values(template)
             except Exception as e:
@@ -252,12 +571,7 @@ class AITemplateProcessor:
         user_msg = self._build_user_message(template, extracted_text)
         
         try:
-            response_content = self._call_ai_api(system_msg, user_msg, timeout)
-            if not response_content:
-                return None
-            
-            # Parse JSON from AI response
-            parsed_json = self._extract_json_from_response(response_content)
+            parsed_json = self._generate_json_cached(system_msg, user_msg, timeout)
             
             if parsed_json:
                 print("Successfully generated structured JSON")
@@ -305,11 +619,54 @@ class AITemplateProcessor:
             "Your output must be a single, valid JSON object that adheres to the provided schema with the values replaced by the extracted data."
         )
     
+    def _template_json(self, template: Dict[str, Any]) -> str:
+        """Return the template as compact JSON, serializing it only when the template changes."""
+        cached = self._template_text
+        if cached is None or cached[0] is not template:
+            cached = (template, _json_dumps(template))
+            self._template_text = cached
+        return cached[1]
+    
+    def _truncate_ocr_text(self, text: str) -> str:
+        """Trim OCR text to the prompt budget, counting tokens when tiktoken is installed."""
+        # Tokens are built from UTF-8 bytes, so there are never more tokens than
+        # bytes; text within the budget in bytes fits either budget. Non-ASCII
+        # characters take several bytes (and often several tokens) each.
+        if len(text) <= self.OCR_TEXT_MAX_TOKENS and (
+                text.isascii() or len(text.encode("utf-8")) <= self.OCR_TEXT_MAX_TOKENS):
+            return text
+        
+        if self._encoding is None:
+            self._encoding = self._load_encoding()
+        
+        if not self._encoding:
+            return text[:self.OCR_TEXT_MAX_CHARS]
+        tokens = self._encoding.encode(text, disallowed_special=())
+        if len(tokens) <= self.OCR_TEXT_MAX_TOKENS:
+            return text
+        return self._encoding.decode(tokens[:self.OCR_TEXT_MAX_TOKENS])
+    
+    def _load_encoding(self) -> Any:
+        """Return the tokenizer for the configured model, or False if tiktoken cannot provide one."""
+        if tiktoken is None:
+            return False
+        # Azure deployments are often named after their model; unknown names use cl100k_base
+        model = self.ai_config.get("model") or self.ai_config.get("deployment") or ""
+        try:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # Encoding files are downloaded on first use and may be unavailable
+            print(f"Warning: Could not load tiktoken encoding, trimming by characters: {e}")
+            return False
+    
     def _build_user_message(self, template: Dict[str, Any], text: str) -> str:
         """Build the user message with template and OCR text."""
         return (
-            f"JSON TEMPLATE:\n{json.dumps(template, indent=2)}\n\n"
-            f"OCR TEXT:\n{text[:50000]}\n\n"
+            f"JSON TEMPLATE:\n{self._template_json(template)}\n\n"
+            f"OCR TEXT:\n{self._truncate_ocr_text(text)}\n\n"
             "INSTRUCTIONS (READ CAREFULLY):\n"
             "1) Output: Return ONLY a single, valid JSON object that matches the provided template structure. Do NOT output any additional text, explanation, or commentary.\n"
             "2) Use source data only: Replace template values only with data explicitly found in the OCR text. Do not invent values or use placeholder/sample values from the template.\n"
@@ -327,6 +684,51 @@ class AITemplateProcessor:
             "Return the populated JSON object now."
         )
     
+    def _generate_json_cached(self, system_msg: str, user_msg: str, timeout: int) -> Optional[Dict[str, Any]]:
+        """Return the JSON parsed from the AI reply, calling the API only on a cache miss."""
+        # Requests use temperature 0, so identical prompts sent to the same model
+        # reuse the earlier result. Only replies that parse to a JSON object are
+        # cached (in memory and, with AI_CACHE_DIR, on disk), so a truncated or
+        # malformed reply is requested again instead of replayed.
+        # The URL names the Azure deployment and API version; OpenAI names the model.
+        # Each part is length-prefixed so no two different inputs share a byte stream.
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (self.ai_config["url"], self.ai_config.get("model", ""), str(self.json_mode),
+                     system_msg, user_msg):
+            data = part.encode("utf-8")
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+        cache_key = digest.hexdigest()
+        
+        with self._cache_lock:
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                self._response_cache.move_to_end(cache_key)
+        if cached is not None:
+            print("Using cached AI response for identical input")
+            return cached
+        
+        cache_file = os.path.join(self.cache_dir, f"{cache_key}.json") if self.cache_dir else None
+        stored = _read_cache_file(cache_file) if cache_file else None
+        if stored and isinstance(stored.get("json"), dict):
+            print(f"Using cached AI response from: {cache_file}")
+            parsed = stored["json"]
+        else:
+            content = self._call_ai_api(system_msg, user_msg, timeout)
+            if not content:
+                return None
+            parsed = self._extract_json_from_response(content)
+            if not isinstance(parsed, dict):
+                return parsed
+            if cache_file:
+                _write_cache_file(cache_file, {"json": parsed})
+        
+        with self._cache_lock:
+            self._response_cache[cache_key] = parsed
+            if len(self._response_cache) > self.RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+        return parsed
+    
     def _call_ai_api(self, system_msg: str, user_msg: str, timeout: int) -> Optional[str]:
         """Make API call to the configured AI service."""
         payload = {
@@ -337,79 +739,89 @@ class AITemplateProcessor:
             "temperature": 0,
             "max_tokens": 4000,
         }
+        if self.json_mode:
+            payload["response_format"] = {"type": "json_object"}
         
-        if self.ai_config["type"] == "azure_openai":
-            return self._call_azure_openai(payload, timeout)
-        elif self.ai_config["type"] == "openai":
-            return self._call_openai(payload, timeout)
-        else:
-            raise ValueError(f"Unknown AI configuration type: {self.ai_config['type']}")
+        return self._chat_completion(payload, timeout)
     
-    def _call_azure_openai(self, payload: Dict[str, Any], timeout: int) -> Optional[str]:
-        """Call Azure OpenAI API."""
-        url = (f"{self.ai_config['endpoint']}/openai/deployments/{self.ai_config['deployment']}/"
-               f"chat/completions?api-version={self.ai_config['api_version']}")
-        headers = {"api-key": self.ai_config["key"], "Content-Type": "application/json"}
-        
-        resp = requests.post(url, headers=headers, json=payload, timeout=timeout)
-        if resp.status_code not in (200, 201):
-            raise RuntimeError(f"Azure OpenAI API call failed: {resp.status_code} {resp.text}")
+    def _chat_completion(self, payload: Dict[str, Any], timeout: int) -> Optional[str]:
+        """Post a chat-completion payload to the configured service and return the reply text."""
+        config = self.ai_config
+        # Azure OpenAI selects the model through the deployment in the URL
+        if "model" in config:
+            payload["model"] = config["model"]
         
-        body = resp.json()
-        return body.get("choices", [])[0].get("message", {}).get("content")
-    
-    def _call_openai(self, payload: Dict[str, Any], timeout: int) -> Optional[str]:
-        """Call OpenAI API."""
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {"Authorization": f"Bearer {self.ai_config['key']}", "Content-Type": "application/json"}
-        payload["model"] = self.ai_config["model"]
+        resp = self._post_chat(payload, timeout)
+        # Older API versions and models reject response_format; resend without it
+        if resp.status_code == 400 and "response_format" in payload and "response_format" in resp.text:
+            print(f"Warning: {config['label']} rejected JSON mode; retrying without response_format")
+            self.json_mode = False
+            del payload["response_format"]
+            resp = self._post_chat(payload, timeout)
         
-        resp = requests.post(url, headers=headers, json=payload, timeout=timeout)
         if resp.status_code not in (200, 201):
-            raise RuntimeError(f"OpenAI API call failed: {resp.status_code} {resp.text}")
+            raise RuntimeError(f"{config['label']} API call failed: {resp.status_code} {resp.text}")
         
-        body = resp.json()
-        return body.get("choices", [])[0].get("message", {}).get("content")
+        reply = _json_loads(resp.content)
+        return reply.get("choices", [])[0].get("message", {}).get("content")
+    
+    def _post_chat(self, payload: Dict[str, Any], timeout: int) -> requests.Response:
+        """Send a chat-completion payload, retrying transient failures."""
+        config = self.ai_config
+        # The headers already declare application/json
+        return _post_with_retries(config["url"], config["label"], attempts=self.RETRY_ATTEMPTS,
+                                  max_wait=self.RETRY_MAX_WAIT, headers=config["headers"],
+                                  data=_json_body(payload), timeout=timeout)
     
     def _extract_json_from_response(self, response: str) -> Optional[Dict[str, Any]]:
         """Extract and parse JSON from AI response."""
-        # Try to find JSON object first
-        starts = [m.start() for m in re.finditer(r"\{", response)]
-        for start in starts:
-            depth = 0
-            for i in range(start, len(response)):
-                if response[i] == "{":
-                    depth += 1
-                elif response[i] == "}":
-                    depth -= 1
-                    if depth == 0:
-                        candidate = response[start:i+1]
-                        try:
-                            return json.loads(candidate)
-                        except Exception:
-                            break
+        # JSON mode responses are a bare object; parse them directly
+        try:
+            parsed = _json_loads(response)
+            if isinstance(parsed, dict):
+                return parsed
+        except Exception:
+            pass
+        
+        # Markdown-fenced replies: parse the first fenced block (after its
+        # language tag line) on its own before scanning the whole text
+        fence = response.find("```")
+        if fence != -1:
+            body_start = response.find("\n", fence) + 1
+            body_end = response.find("```", body_start) if body_start else -1
+            if body_end != -1:
+                try:
+                    parsed = _json_loads(response[body_start:body_end])
+                    if isinstance(parsed, dict):
+                        return parsed
+                except Exception:
+                    pass
+        
+        # Otherwise find the first JSON object embedded in the text
+        parsed = self._decode_first_json(response, "{")
+        if parsed is not None:
+            return parsed
         
         # If no object found, try array
-        starts = [m.start() for m in re.finditer(r"\[", response)]
-        for start in starts:
-            depth = 0
-            for i in range(start, len(response)):
-                if response[i] == "[":
-                    depth += 1
-                elif response[i] == "]":
-                    depth -= 1
-                    if depth == 0:
-                        candidate = response[start:i+1]
-                        try:
-                            return json.loads(candidate)
-                        except Exception:
-                            break
+        parsed = self._decode_first_json(response, "[")
+        if parsed is not None:
+            return parsed
         
         # Fallback: try to parse the entire response
         try:
-            return json.loads(response)
+            return _json_loads(response)
         except Exception:
             return None
+    
+    def _decode_first_json(self, response: str, open_char: str) -> Optional[Any]:
+        """Parse the first valid JSON value that starts at an open_char in the response."""
+        start = response.find(open_char)
+        while start != -1:
+            try:
+                return _JSON_DECODER.raw_decode(response, start)[0]
+            except ValueError:
+                start = response.find(open_char, start + 1)
+        return None
 
 
 class PDFProcessor:
@@ -425,7 +837,9 @@ class PDFProcessor:
             endpoint=self.config["azure_di_endpoint"],
             api_key=self.config["azure_di_key"],
             model_id=self.config.get("azure_di_model_id", "prebuilt-document"),
-            api_version=self.config.get("azure_di_api_version", "2023-07-31")
+            api_version=self.config.get("azure_di_api_version", "2023-07-31"),
+            cache_dir=self.config.get("azure_di_cache_dir"),
+            poll_timeout=self.config.get("azure_di_poll_timeout", 300.0)
         )
         
         self.ai_processor = AITemplateProcessor()
@@ -472,6 +886,9 @@ class PDFProcessor:
         )
         config["azure_di_model_id"] = os.getenv("AZURE_DI_MODEL_ID", "prebuilt-document")
         config["azure_di_api_version"] = os.getenv("AZURE_DI_API_VERSION", "2023-07-31")
+        config["azure_di_cache_dir"] = os.getenv("AZURE_DI_CACHE_DIR") or None
+        config["azure_di_poll_timeout"] = _positive_env("AZURE_DI_POLL_TIMEOUT", 300.0)
+        config["batch_workers"] = _positive_env("PDF_BATCH_WORKERS", 1, int)
         
         # Database / API integration configuration
         config["db"] = {
@@ -509,13 +926,10 @@ class PDFProcessor:
         
         print(f"Processing PDF file: {pdf_path}")
         
-        # Step 1: Read PDF file
-        with open(pdf_path, 'rb') as f:
-            file_bytes = f.read()
-        
-        # Step 2: Extract text using OCR
+        # Step 1 + 2: Stream the PDF file to OCR without reading it into memory
         print("Step 1: Extracting text using Document Intelligence...")
-        extracted_text = self.ocr_processor.extract_text_from_pdf(file_bytes)
+        with open(pdf_path, 'rb') as f:
+            extracted_text = self.ocr_processor.extract_text_from_pdf(f)
         
         # Step 3: Load template
         template = self.ai_processor.load_template(template_path)
@@ -553,41 +967,53 @@ class PDFProcessor:
         # Ensure output directory exists
         os.makedirs(os.path.dirname(final_path), exist_ok=True)
         
-        with open(final_path, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, indent=2, ensure_ascii=False)
+        _write_text_atomic(final_path, _json_dumps(json_data, pretty=True))
         
         return final_path
     
-    def process_multiple_pdfs(self, pdf_paths: list, output_dir: Optional[str] = None) -> list:
+    def process_multiple_pdfs(self, pdf_paths: list, output_dir: Optional[str] = None,
+                              max_workers: Optional[int] = None) -> list:
         """
         Process multiple PDF files.
         
         Args:
             pdf_paths: List of PDF file paths
             output_dir: Optional output directory for all JSON files
+            max_workers: Files processed at once (defaults to PDF_BATCH_WORKERS)
             
         Returns:
-            List of generated JSON file paths
+            List of generated JSON file paths, in input order
         """
         results = []
         failed_files = []
         
-        for i, pdf_path in enumerate(pdf_paths, 1):
+        def process_one(i: int, pdf_path: str) -> str:
+            print(f"\nProcessing file {i}/{len(pdf_paths)}: {os.path.basename(pdf_path)}")
+            
+            output_path = None
+            if output_dir:
+                base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+                output_path = os.path.join(output_dir, f"{base_name}.json")
+            
+            return self.process_pdf(pdf_path, output_path)
+        
+        def collect(pdf_path: str, run) -> None:
             try:
-                print(f"\nProcessing file {i}/{len(pdf_paths)}: {os.path.basename(pdf_path)}")
-                
-                output_path = None
-                if output_dir:
-                    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-                    output_path = os.path.join(output_dir, f"{base_name}.json")
-                
-                result_path = self.process_pdf(pdf_path, output_path)
-                results.append(result_path)
-                
+                results.append(run())
             except Exception as e:
                 print(f"Error processing {pdf_path}: {e}")
                 failed_files.append((pdf_path, str(e)))
         
+        workers = min(max_workers or self.config["batch_workers"], max(len(pdf_paths), 1))
+        if workers == 1:
+            for i, pdf_path in enumerate(pdf_paths, 1):
+                collect(pdf_path, lambda: process_one(i, pdf_path))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(process_one, i, pdf_path) for i, pdf_path in enumerate(pdf_paths, 1)]
+                for pdf_path, future in zip(pdf_paths, futures):
+                    collect(pdf_path, future.result)
+        
         # Summary
         print(f"\n{'='*50}")
         print(f"Batch Processing Complete!")